@@ -1,153 +1,491 @@
 import streamlit as st
+import atexit
+import bisect
+import hashlib
 import json
+import mmap
 import os
+import tempfile
+import threading
+import time
+import uuid
 from collections import deque
 from google import genai  # 👈 new import
 
-# --------------- GEMINI SETUP ---------------
-# Reads GEMINI_API_KEY from Streamlit secrets (we will set during deployment)
 try:
-    client = genai.Client(api_key=st.secrets["GEMINI_API_KEY"])
-except Exception:
-    client = None  # Will show a warning in UI if not configured
+    import orjson  # optional: much faster JSON encoding
+except ImportError:
+    orjson = None
+
+try:
+    import ijson  # optional: incremental parsing of large recipe files
+except ImportError:
+    ijson = None
 
+try:
+    import xxhash  # optional: fast content hashing of recipes.json
+except ImportError:
+    xxhash = None
+
+# --------------- GEMINI SETUP ---------------
 MODEL_NAME = "gemini-2.5-flash"
 
 
-def ask_recipe_ai(prompt: str) -> str:
+@st.cache_resource
+def get_genai_client():
     """
-    Call Gemini 2.5 Flash to generate a detailed recipe.
-    Follows the same style as your first-aid bot example.
+    One Gemini client (and its connection pool) per process, shared by all
+    sessions. Reads GEMINI_API_KEY from Streamlit secrets (we will set during
+    deployment); raises if it is missing, which Streamlit does not cache.
     """
+    return genai.Client(api_key=st.secrets["GEMINI_API_KEY"])
+
+
+def build_recipe_prompt(prompt: str) -> str:
     system_instruction = (
         "You are a helpful cooking assistant. "
         "You give clear, step-by-step recipes with ingredients and instructions. "
         "Be detailed but easy to follow. Assume the user is a beginner cook."
     )
 
-    full_prompt = (
+    return (
         f"{system_instruction}\n\n"
         f"User wants a recipe or help with cooking.\n"
         f"User: {prompt}\n"
         f"Assistant:"
     )
 
-    if client is None:
+
+AI_CACHE_TTL_SECONDS = 3600
+AI_CACHE_MAX_ENTRIES = 256
+
+
+@st.cache_resource
+def _ai_answer_cache():
+    """
+    Process-wide ``{normalized prompt: (stored_at, answer)}``, oldest first.
+    A plain dict rather than st.cache_data, because a streamed answer is
+    only known once the stream has been fully consumed.
+    """
+    return {}
+
+
+def _cached_ai_answer(key):
+    entry = _ai_answer_cache().get(key)
+    if entry is None:
+        return None
+    stored_at, answer = entry
+    if time.monotonic() - stored_at > AI_CACHE_TTL_SECONDS:
+        _ai_answer_cache().pop(key, None)
+        return None
+    return answer
+
+
+def _store_ai_answer(key, answer):
+    cache = _ai_answer_cache()
+    now = time.monotonic()
+    for k, (stored_at, _) in list(cache.items()):
+        if now - stored_at > AI_CACHE_TTL_SECONDS:
+            cache.pop(k, None)
+    # Re-insert so insertion order tracks store time, then evict the oldest
+    cache.pop(key, None)
+    cache[key] = (now, answer)
+    while len(cache) > AI_CACHE_MAX_ENTRIES:
+        cache.pop(next(iter(cache)), None)
+
+
+def forget_ai_answer(prompt: str):
+    _ai_answer_cache().pop(prompt.strip().lower(), None)
+
+
+def ask_recipe_ai(prompt: str, stream_to=None) -> str:
+    """
+    Call Gemini 2.5 Flash to generate a detailed recipe.
+    Follows the same style as your first-aid bot example.
+    Identical prompts (ignoring case and surrounding spaces) are served
+    from cache for an hour. If ``stream_to`` (a Streamlit container) is
+    given, the answer is written into it chunk by chunk as it arrives.
+    """
+    try:
+        client = get_genai_client()
+    except Exception:
         return (
             "Gemini API is not configured. "
             "On Streamlit Cloud, go to **Settings → Secrets** and add:\n\n"
             "`GEMINI_API_KEY = \"your-key\"`"
         )
 
+    key = prompt.strip().lower()
+    cached = _cached_ai_answer(key)
+    if cached is not None:
+        return cached
+
+    contents = build_recipe_prompt(prompt)
     try:
-        response = client.models.generate_content(
-            model=MODEL_NAME,
-            contents=full_prompt,
-        )
-        text = (response.text or "").strip()
+        if stream_to is not None:
+            chunks = client.models.generate_content_stream(
+                model=MODEL_NAME,
+                contents=contents,
+            )
+            text = stream_to.write_stream(c.text for c in chunks if c.text)
+        else:
+            response = client.models.generate_content(
+                model=MODEL_NAME,
+                contents=contents,
+            )
+            text = response.text
+        text = (text or "").strip()
         if not text:
             return "Sorry, I couldn't generate a response. Please try again."
+        _store_ai_answer(key, text)
         return text
     except Exception as e:
         return f"Error from AI: {e}"
 
 
 # ================================
-# Binary Search Tree for Recipes
+# Helpers: load/save & init state
 # ================================
 
-class TreeNode:
-    def __init__(self, recipe):
-        self.recipe = recipe
-        self.left = None
-        self.right = None
+RECIPES_FILE = "recipes.json"
+SAVE_DEBOUNCE_SECONDS = 2.0
+STREAM_LOAD_MIN_BYTES = 1024 * 1024
 
+def parse_lines(text):
+    """Non-empty, stripped lines of a text area, in a single pass."""
+    return [s for s in (line.strip() for line in text.splitlines()) if s]
 
-class BinarySearchTree:
-    def __init__(self):
-        self.root = None
 
-    def insert(self, recipe):
-        if not self.root:
-            self.root = TreeNode(recipe)
-        else:
-            self._insert_recursively(self.root, recipe)
+# Fields computed by prepare_recipe(); stripped again before saving
+DERIVED_KEYS = ("_name_lower", "_ing_md", "_steps_md")
 
-    def _insert_recursively(self, node, recipe):
-        # Compare by lowercase name so search is case-insensitive
-        new_name = recipe["name"].lower()
-        node_name = node.recipe["name"].lower()
 
-        if new_name < node_name:
-            if node.left is None:
-                node.left = TreeNode(recipe)
-            else:
-                self._insert_recursively(node.left, recipe)
-        else:
-            if node.right is None:
-                node.right = TreeNode(recipe)
-            else:
-                self._insert_recursively(node.right, recipe)
+def prepare_recipe(recipe):
+    """Attach the DERIVED_KEYS fields (never saved to disk)."""
+    recipe["_name_lower"] = recipe["name"].lower()
+    recipe["_ing_md"] = "\n".join(
+        f"- {ing}" for ing in recipe.get("ingredients", [])
+    )
+    recipe["_steps_md"] = "\n\n".join(
+        f"**Step {i}.** {step}"
+        for i, step in enumerate(recipe.get("instructions", []), start=1)
+    )
+    return recipe
 
-    def search(self, name):
-        """Exact search by name (case-insensitive)."""
-        return self._search_recursively(self.root, name.lower())
 
-    def _search_recursively(self, node, name_lower):
-        if node is None:
-            return None
+def strip_derived(recipe):
+    return {k: v for k, v in recipe.items() if k not in DERIVED_KEYS}
 
-        node_name = node.recipe["name"].lower()
 
-        if node_name == name_lower:
-            return node.recipe
-        elif name_lower < node_name:
-            return self._search_recursively(node.left, name_lower)
-        else:
-            return self._search_recursively(node.right, name_lower)
+def file_content_hash(path):
+    """Hash of the file's bytes, read through mmap (xxh3 when available)."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return "empty"
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if xxhash is not None:
+                return xxhash.xxh3_64_hexdigest(mm)
+            return hashlib.blake2b(mm).hexdigest()
 
 
-# ================================
-# Helpers: load/save & init state
-# ================================
+def _checked_recipe(i, recipe):
+    """prepare_recipe(), after checking the item is a recipe we can index."""
+    if not isinstance(recipe, dict) or not isinstance(recipe.get("name"), str):
+        raise ValueError(f'recipe #{i} has no valid "name"')
+    return prepare_recipe(recipe)
+
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def _load_cached(path, content_hash):
+    """Parse the recipes file once per distinct content, shared across sessions.
+
+    ``content_hash`` is only part of the cache key, so touching or rewriting
+    the file with identical bytes never triggers a reparse. Each caller gets
+    its own copy, so sessions can mutate the result freely. Large files are
+    parsed item by item with ijson, so the raw text is never held in memory
+    all at once. Raises ValueError if the file isn't a list of named recipes.
+    """
+    with open(path, "rb") as f:
+        if ijson is not None and os.path.getsize(path) > STREAM_LOAD_MIN_BYTES:
+            # ijson would silently yield nothing for a non-list document
+            if not f.read(64).lstrip().startswith(b"["):
+                raise ValueError("expected a JSON list of recipes")
+            f.seek(0)
+            return [
+                _checked_recipe(i, r)
+                for i, r in enumerate(ijson.items(f, "item", use_float=True), 1)
+            ]
+        data = f.read()
+    recipes = orjson.loads(data) if orjson is not None else json.loads(data)
+    if not isinstance(recipes, list):
+        raise ValueError("expected a JSON list of recipes")
+    return [_checked_recipe(i, r) for i, r in enumerate(recipes, 1)]
 
-RECIPES_FILE = "recipes.json"
 
 def load_recipes_from_file():
-    if os.path.exists(RECIPES_FILE):
-        try:
-            with open(RECIPES_FILE, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except Exception:
-            return []
-    return []
+    """Recipes stored on disk; a missing or empty file is an empty store.
+
+    Anything unreadable raises instead of returning ``[]``, so the caller
+    can't mistake it for an empty store and save over the user's data.
+    """
+    if not os.path.exists(RECIPES_FILE) or os.path.getsize(RECIPES_FILE) == 0:
+        return []
+    return _load_cached(RECIPES_FILE, file_content_hash(RECIPES_FILE))
+
+
+def dump_recipes(recipes):
+    """Serialize recipes to UTF-8 JSON bytes, using orjson when available.
+
+    Both paths produce the same 2-space layout (orjson only supports that
+    indent), so saves don't reformat the file when orjson comes and goes.
+    """
+    if orjson is not None:
+        return orjson.dumps(recipes, option=orjson.OPT_INDENT_2)
+    return json.dumps(recipes, indent=2, ensure_ascii=False).encode("utf-8")
 
 
 def save_recipes_to_file(recipes):
+    # Write to a fresh temp file, fsync it and swap it in, so a crash or
+    # power loss mid-write never leaves a truncated recipes.json behind.
+    # Sessions are threads in one process, so each save gets its own file.
+    tmp_path = None
     try:
-        with open(RECIPES_FILE, "w", encoding="utf-8") as f:
-            json.dump(recipes, f, indent=4, ensure_ascii=False)
+        data = dump_recipes([strip_derived(r) for r in recipes])
+        fd, tmp_path = tempfile.mkstemp(
+            suffix=".tmp",
+            dir=os.path.dirname(os.path.abspath(RECIPES_FILE)),
+        )
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(RECIPES_FILE):
+            # mkstemp creates the file as 0600; keep the existing permissions
+            os.chmod(tmp_path, os.stat(RECIPES_FILE).st_mode & 0o777)
+        os.replace(tmp_path, RECIPES_FILE)
+        return True
     except Exception as e:
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.remove(tmp_path)
         st.error(f"Failed to save recipes: {e}")
+        return False
+
+
+@st.cache_resource
+def _pending_saves():
+    """Process-wide ``{session id: (index, shadowed)}`` of unwritten changes.
+
+    Shared across sessions so that a new session (e.g. after a browser
+    refresh) and the atexit hook can write out edits their own session has
+    not flushed yet; ``st.session_state`` is gone by the time atexit runs.
+    """
+    pending = {"lock": threading.Lock(), "sessions": {}}
+    atexit.register(flush_pending_saves, pending)
+    return pending
+
+
+def recipes_lock():
+    """Lock guarding pending saves and multi-step edits to a session's store.
+
+    flush_pending_saves() reads other sessions' stores from other threads,
+    so an edit that briefly leaves the store inconsistent must hold it.
+    """
+    return _pending_saves()["lock"]
+
+
+def flush_pending_saves(pending=None):
+    """Write every session's unsaved recipes, oldest change first."""
+    if pending is None:
+        pending = _pending_saves()
+    with pending["lock"]:
+        # Snapshot while no session is midway through an edit
+        items = [
+            (session_id, store, recipes_for_save(*store))
+            for session_id, store in pending["sessions"].items()
+        ]
+        pending["sessions"].clear()
+    for session_id, store, recipes in items:
+        if not save_recipes_to_file(recipes):
+            with pending["lock"]:
+                pending["sessions"].setdefault(session_id, store)
+
+
+def mark_recipes_dirty():
+    """Record a mutation; writes are batched by flush_if_dirty()."""
+    st.session_state.recipes_version += 1
+    if st.session_state.load_error:
+        return  # Saving is disabled; see init_session_state()
+    st.session_state.recipes_dirty = True
+    pending = _pending_saves()
+    with pending["lock"]:
+        # Re-insert so the dict stays ordered by latest change
+        pending["sessions"].pop(st.session_state.session_id, None)
+        pending["sessions"][st.session_state.session_id] = (
+            st.session_state.recipe_index,
+            st.session_state.shadowed_recipes,
+        )
+    flush_if_dirty()
+
+
+def flush_if_dirty(force=False):
+    """Save this session's changes once the debounce window has passed.
+
+    Returns True if this session's changes are now in recipes.json.
+    """
+    if not st.session_state.recipes_dirty:
+        return False
+    elapsed = time.monotonic() - st.session_state.recipes_saved_at
+    if not force and elapsed < SAVE_DEBOUNCE_SECONDS:
+        return False
+    session_id = st.session_state.session_id
+    pending = _pending_saves()
+    with pending["lock"]:
+        store = pending["sessions"].pop(session_id, None)
+    if store is None:
+        # flush_pending_saves() already wrote these changes, and another
+        # session may have saved newer ones since; writing our copy again
+        # would overwrite them.
+        st.session_state.recipes_dirty = False
+        return True
+    if not save_recipes_to_file(recipes_for_save(*store)):
+        with pending["lock"]:
+            pending["sessions"].setdefault(session_id, store)
+        return False
+    st.session_state.recipes_dirty = False
+    st.session_state.recipes_saved_at = time.monotonic()
+    return True
 
 
 def build_tree(recipes):
-    tree = BinarySearchTree()
+    """Index recipes by lowercase name for O(1) case-insensitive lookup.
+
+    The index is the session's canonical recipe store; dicts keep insertion
+    order, so its values double as the recipe list. Returns
+    ``(index, shadowed)``: recipes whose name repeats an earlier one apart
+    from case can't be indexed, so they are set aside (and written back on
+    save) instead of being dropped.
+    """
+    index = {}
+    shadowed = []
     for r in recipes:
-        tree.insert(r)
-    return tree
+        if r["_name_lower"] in index:
+            shadowed.append(r)
+        else:
+            index[r["_name_lower"]] = r
+    return index, shadowed
+
+
+def recipes_for_save(index, shadowed):
+    return [*index.values(), *shadowed]
+
+
+def name_taken(name_lower):
+    """True if an indexed or shadowed recipe already uses this name."""
+    return name_lower in st.session_state.recipe_index or any(
+        r["_name_lower"] == name_lower for r in st.session_state.shadowed_recipes
+    )
+
+
+def unshadow(name_lower):
+    """Move the first shadowed recipe with this name into the index.
+
+    Call (holding recipes_lock()) once ``name_lower`` has left the index.
+    """
+    shadowed = st.session_state.shadowed_recipes
+    for i, r in enumerate(shadowed):
+        if r["_name_lower"] == name_lower:
+            st.session_state.recipe_index[name_lower] = shadowed.pop(i)
+            return
 
 
 def init_session_state():
-    if "recipes" not in st.session_state:
-        st.session_state.recipes = load_recipes_from_file()
-        st.session_state.recipe_tree = build_tree(st.session_state.recipes)
+    if "recipe_index" not in st.session_state:
+        # Another session may still hold unsaved edits; write them first so
+        # this one doesn't load a stale recipes.json
+        flush_pending_saves()
+        st.session_state.session_id = uuid.uuid4().hex
+        # If the file can't be read, start empty but never save: writing
+        # this session's recipes would overwrite whatever is in the file
+        st.session_state.load_error = None
+        try:
+            recipes = load_recipes_from_file()
+        except Exception as e:
+            recipes = []
+            st.session_state.load_error = str(e)
+        (
+            st.session_state.recipe_index,
+            st.session_state.shadowed_recipes,
+        ) = build_tree(recipes)
+        st.session_state.recipes_dirty = False
+        st.session_state.recipes_saved_at = time.monotonic()
+        st.session_state.recipes_version = 0
+        st.session_state.filter_memo = None
+        st.session_state.names_blob = None
         st.session_state.recently_viewed = deque(maxlen=5)
+        st.session_state.recently_viewed_set = set()  # O(1) membership
         st.session_state.chat_history = []
 
 
-def rebuild_tree():
-    st.session_state.recipe_tree = build_tree(st.session_state.recipes)
+def _names_blob():
+    """NUL-joined lowercase names, their start offsets and the matching recipes.
+
+    Rebuilt only when recipes_version changes.
+    """
+    cached = st.session_state.names_blob
+    if cached is not None and cached[0] == st.session_state.recipes_version:
+        return cached[1:]
+
+    recipes = list(st.session_state.recipe_index.values())
+    offsets = []
+    pos = 0
+    for r in recipes:
+        offsets.append(pos)
+        pos += len(r["_name_lower"]) + 1
+    blob = "\0".join(r["_name_lower"] for r in recipes)
+
+    st.session_state.names_blob = (
+        st.session_state.recipes_version, blob, offsets, recipes
+    )
+    return blob, offsets, recipes
+
+
+def partial_matches(q):
+    """Recipes whose lowercase name contains ``q``, in one pass over the blob."""
+    if "\0" in q:
+        return []
+    blob, offsets, recipes = _names_blob()
+    matches = []
+    pos = blob.find(q)
+    while pos != -1:
+        i = bisect.bisect_right(offsets, pos) - 1
+        matches.append(recipes[i])
+        # Skip the rest of this name so each recipe matches at most once
+        next_start = offsets[i + 1] if i + 1 < len(offsets) else len(blob)
+        pos = blob.find(q, next_start)
+    return matches
+
+
+def filter_recipes(search_query):
+    """Recipes matching the search box, memoized until the next mutation.
+
+    Kept in session_state rather than st.cache_data: the result refers to
+    this session's recipe objects, and recipes_version is per session.
+    """
+    key = (search_query, st.session_state.recipes_version)
+    memo = st.session_state.filter_memo
+    if memo is not None and memo[0] == key:
+        return memo[1]
+
+    # Try exact search via the name index
+    exact_result = st.session_state.recipe_index.get(search_query.strip().lower())
+    if exact_result:
+        filtered = [exact_result]
+    else:
+        # Partial match fallback
+        filtered = partial_matches(search_query.lower())
+
+    st.session_state.filter_memo = (key, filtered)
+    return filtered
 
 
 # ================================
@@ -156,10 +494,17 @@ def rebuild_tree():
 
 st.set_page_config("Recipe Management System", layout="wide")
 init_session_state()
+flush_if_dirty()
 
 st.title("🍽️ Recipe Management System (Web)")
 st.caption("Manage your recipes and ask Gemini 2.5 Flash for new ones.")
 
+if st.session_state.load_error:
+    st.error(
+        f"Couldn't read {RECIPES_FILE}: {st.session_state.load_error}. "
+        "Changes made here won't be saved; fix or move the file and reload."
+    )
+
 
 # -------------------------------
 # Left: Recipe List + Actions
@@ -169,25 +514,22 @@ left_col, right_col = st.columns([1, 2], gap="large")
 with left_col:
     st.subheader("Your Recipes")
 
+    if st.session_state.shadowed_recipes:
+        hidden = ", ".join(r["name"] for r in st.session_state.shadowed_recipes)
+        st.warning(
+            f"Hidden because another recipe has the same name (ignoring case): "
+            f"{hidden}. They are kept in {RECIPES_FILE} and show up here once "
+            f"the visible recipe with that name is renamed or deleted."
+        )
+
     # Search
     search_query = st.text_input("Search recipes by name")
 
-    all_recipes = st.session_state.recipes
-
     # Filter recipes
     if search_query.strip():
-        # Try exact search via BST
-        bst_result = st.session_state.recipe_tree.search(search_query.strip())
-        if bst_result:
-            filtered_recipes = [bst_result]
-        else:
-            # Partial match fallback
-            filtered_recipes = [
-                r for r in all_recipes
-                if search_query.lower() in r["name"].lower()
-            ]
+        filtered_recipes = filter_recipes(search_query)
     else:
-        filtered_recipes = all_recipes
+        filtered_recipes = list(st.session_state.recipe_index.values())
 
     recipe_names = [r["name"] for r in filtered_recipes]
 
@@ -221,38 +563,34 @@ with left_col:
             if add_submitted:
                 if not new_name.strip():
                     st.error("Recipe name cannot be empty.")
-                elif any(r["name"].lower() == new_name.lower() for r in all_recipes):
+                elif name_taken(new_name.strip().lower()):
                     st.error(f"A recipe with name '{new_name}' already exists.")
                 else:
-                    new_recipe = {
+                    new_recipe = prepare_recipe({
                         "name": new_name.strip(),
-                        "ingredients": [
-                            line.strip() for line in new_ingredients_text.splitlines()
-                            if line.strip()
-                        ],
-                        "instructions": [
-                            line.strip() for line in new_instructions_text.splitlines()
-                            if line.strip()
-                        ],
-                    }
-                    st.session_state.recipes.append(new_recipe)
-                    rebuild_tree()
-                    save_recipes_to_file(st.session_state.recipes)
+                        "ingredients": parse_lines(new_ingredients_text),
+                        "instructions": parse_lines(new_instructions_text),
+                    })
+                    st.session_state.recipe_index[new_recipe["_name_lower"]] = new_recipe
+                    mark_recipes_dirty()
                     st.success("Recipe added successfully!")
                     st.rerun()
 
     # Delete recipe
     if selected_recipe_name:
         if st.button(f"🗑️ Delete '{selected_recipe_name}'"):
-            st.session_state.recipes = [
-                r for r in st.session_state.recipes
-                if r["name"] != selected_recipe_name
-            ]
-            rebuild_tree()
-            save_recipes_to_file(st.session_state.recipes)
+            with recipes_lock():
+                st.session_state.recipe_index.pop(selected_recipe_name.lower(), None)
+                unshadow(selected_recipe_name.lower())
+            mark_recipes_dirty()
             st.success("Recipe deleted.")
             st.rerun()
 
+    # Manual save (changes are otherwise written in batches)
+    if st.button("💾 Save now", disabled=not st.session_state.recipes_dirty):
+        if flush_if_dirty(force=True):
+            st.success("Recipes saved.")
+
     # Recently viewed
     if st.session_state.recently_viewed:
         st.markdown("#### Recently Viewed")
@@ -266,35 +604,36 @@ with left_col:
 with right_col:
     st.subheader("Recipe Details")
 
-    selected_recipe = None
-    if selected_recipe_name:
-        # Find selected recipe
-        for r in filtered_recipes:
-            if r["name"] == selected_recipe_name:
-                selected_recipe = r
-                break
+    selected_recipe = (
+        st.session_state.recipe_index.get(selected_recipe_name.lower())
+        if selected_recipe_name
+        else None
+    )
 
     if selected_recipe:
         # Track recently viewed
-        if selected_recipe["name"] not in st.session_state.recently_viewed:
-            st.session_state.recently_viewed.append(selected_recipe["name"])
+        viewed = st.session_state.recently_viewed
+        viewed_set = st.session_state.recently_viewed_set
+        if selected_recipe["name"] not in viewed_set:
+            if len(viewed) == viewed.maxlen:
+                # The deque is about to drop its oldest entry
+                viewed_set.discard(viewed[0])
+            viewed.append(selected_recipe["name"])
+            viewed_set.add(selected_recipe["name"])
 
         tab1, tab2, tab3 = st.tabs(["Ingredients", "Instructions", "Edit Recipe"])
 
         with tab1:
-            if selected_recipe["ingredients"]:
+            if selected_recipe.get("ingredients", []):
                 st.markdown("### Ingredients")
-                st.markdown(
-                    "\n".join(f"- {ing}" for ing in selected_recipe["ingredients"])
-                )
+                st.markdown(selected_recipe["_ing_md"])
             else:
                 st.info("No ingredients stored for this recipe.")
 
         with tab2:
-            if selected_recipe["instructions"]:
+            if selected_recipe.get("instructions", []):
                 st.markdown("### Instructions")
-                for i, step in enumerate(selected_recipe["instructions"], start=1):
-                    st.markdown(f"**Step {i}.** {step}")
+                st.markdown(selected_recipe["_steps_md"])
             else:
                 st.info("No instructions stored for this recipe.")
 
@@ -312,14 +651,14 @@ with right_col:
         
                 edit_ingredients_text = st.text_area(
                     "Ingredients (one per line)",
-                    value="\n".join(selected_recipe["ingredients"]),
+                    value="\n".join(selected_recipe.get("ingredients", [])),
                     key=f"edit_ingredients_{selected_recipe_name}",
                     height=150,
                 )
         
                 edit_instructions_text = st.text_area(
                     "Instructions (one per line)",
-                    value="\n".join(selected_recipe["instructions"]),
+                    value="\n".join(selected_recipe.get("instructions", [])),
                     key=f"edit_instructions_{selected_recipe_name}",
                     height=200,
                 )
@@ -333,34 +672,37 @@ with right_col:
                     else:
                         # Check duplicate name (excluding current)
                         if (
-                            edit_name.strip().lower() != selected_recipe["name"].lower()
-                            and any(
-                                r["name"].lower() == edit_name.strip().lower()
-                                for r in st.session_state.recipes
-                            )
+                            edit_name.strip().lower() != selected_recipe["_name_lower"]
+                            and name_taken(edit_name.strip().lower())
                         ):
                             st.error(
                                 f"A recipe with name '{edit_name.strip()}' already exists."
                             )
                         else:
-                            # Update in session_state
-                            for r in st.session_state.recipes:
-                                if r["name"] == selected_recipe["name"]:
-                                    r["name"] = edit_name.strip()
-                                    r["ingredients"] = [
-                                        line.strip()
-                                        for line in edit_ingredients_text.splitlines()
-                                        if line.strip()
-                                    ]
-                                    r["instructions"] = [
-                                        line.strip()
-                                        for line in edit_instructions_text.splitlines()
-                                        if line.strip()
+                            # Update in place; the index holds the same dict.
+                            # Locked so flush_pending_saves() never snapshots
+                            # a half-applied edit.
+                            index = st.session_state.recipe_index
+                            with recipes_lock():
+                                r = index[selected_recipe["_name_lower"]]
+                                old_name_lower = r["_name_lower"]
+                                r["name"] = edit_name.strip()
+                                r["ingredients"] = parse_lines(edit_ingredients_text)
+                                r["instructions"] = parse_lines(edit_instructions_text)
+                                prepare_recipe(r)
+                                if r["_name_lower"] != old_name_lower:
+                                    # Re-key in place, keeping the recipe's
+                                    # position (the index is also the saved
+                                    # list order)
+                                    items = [
+                                        (r["_name_lower"] if k == old_name_lower else k, v)
+                                        for k, v in index.items()
                                     ]
-                                    break
+                                    index.clear()
+                                    index.update(items)
+                                    unshadow(old_name_lower)
 
-                            rebuild_tree()
-                            save_recipes_to_file(st.session_state.recipes)
+                            mark_recipes_dirty()
                             st.success("Recipe updated successfully.")
                             st.rerun()
     else:
@@ -374,10 +716,20 @@ with right_col:
         key="chat_input",
     )
     ask_button = st.button("Ask AI")
+    regenerate_button = st.button("🔄 Regenerate")
 
-    if ask_button and user_query.strip():
+    if (ask_button or regenerate_button) and user_query.strip():
+        if regenerate_button:
+            forget_ai_answer(user_query)
         with st.spinner("AI is thinking..."):
-            answer = ask_recipe_ai(user_query)
+            # Stream into a placeholder (older Streamlit: wait for the full
+            # answer), then clear it since the history below shows the answer.
+            placeholder = st.empty()
+            answer = ask_recipe_ai(
+                user_query,
+                stream_to=placeholder if hasattr(st, "write_stream") else None,
+            )
+            placeholder.empty()
             st.session_state.chat_history.append(
                 {"user": user_query, "assistant": answer}
             )